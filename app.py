@@ -1,45 +1,76 @@
 # Required libraries
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
 # Data visualisations
 import plotly.express as px
-import plotly.graph_objects as go
 # Mapping & geospatial analysis
 import folium
-from folium import GeoJson, Choropleth
-from streamlit_folium import st_folium, folium_static
 import geopandas as gpd
 import requests
-from shapely.geometry import Point
-from haversine import haversine, Unit
+import requests_cache
+import shapely
 import datapoint
 
 
+# Mean radius of the Earth (in miles)
+EARTH_RADIUS_MILES = 3958.7613
+# Local snapshot of LNR data (refreshed after 30 days) and on-disk HTTP response cache
+LNR_CACHE_PATH = 'cache/lnr.parquet'
+LNR_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+HTTP_CACHE_PATH = 'cache/http_cache'
+
+# Reserve polygon style shared by every feature (only the fill colour varies)
+RESERVE_STYLE = {'fillOpacity': 0.9, 'color': 'grey', 'weight': 0.1}
+
 # Utility functions
-def miles_to_meters(miles):
+def distance_to_centroids(start_lat, start_lon, centroid_lats, centroid_lons):
     '''
-    Convert miles to meters
-    Args:
-        miles (float): Distance in miles
-    Returns:
-        float: Distance in meters
+    Find distance from point to each polygon centroid
+    Args
+        start_lat (float): Latitude
+        start_lon (float): Longitude
+        centroid_lats (numpy.ndarray): Latitudes of polygon centroids
+        centroid_lons (numpy.ndarray): Longitudes of polygon centroids
+    Returns
+        numpy.ndarray: Haversine distances (in miles, same precision as centroid arrays)
     '''
-    return miles * 1609.34
-
-def distance_from_poly(polygon, start_lat, start_lon):
+    # Haversine formula evaluated over all centroids at once
+    start_lat, centroid_lats = np.radians(start_lat), np.radians(centroid_lats)
+    dlat = centroid_lats - start_lat
+    dlon = np.radians(centroid_lons - start_lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(start_lat) * np.cos(centroid_lats) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+def search_box(start_lat, start_lon, distance_miles):
     '''
-    Find distance from point to polygon centroid
+    Lat/lon window around a point, used to query the centroid index before computing haversine distances
     Args
-        Polygon: Shape from which centroid will be calculated
         start_lat (float): Latitude
         start_lon (float): Longitude
+        distance_miles (float): Half-width of the window (in miles)
+    Returns
+        shapely.Polygon: Bounding box around the point
+    '''
+    # One degree of latitude is ~69 miles, degrees of longitude shrink with cos(latitude)
+    dlat = distance_miles / 69.0
+    dlon = distance_miles / (69.0 * np.cos(np.radians(start_lat)))
+    return shapely.box(start_lon - dlon, start_lat - dlat, start_lon + dlon, start_lat + dlat)
+
+def reserve_style(feature):
+    '''
+    Style for reserve polygons on the map (fill colour is precomputed in the "_color" property)
+    Args
+        feature (dict): GeoJSON feature
     Returns
-        float: Haversine distance
+        dict: Leaflet path style
     '''
-    end_lat = polygon.centroid.y
-    end_lon = polygon.centroid.x
-    return round(haversine((start_lat, start_lon), (end_lat, end_lon), unit=Unit.MILES), 2)
+    return {**RESERVE_STYLE, 'fillColor': feature['properties']['_color']}
 
 def dataframe_with_selections(df):
     '''
@@ -65,14 +96,247 @@ def dataframe_with_selections(df):
     selected_rows = edited_df[edited_df["Show weather forecast"]]
     return selected_rows.drop("Show weather forecast", axis=1)
 
-# Function to bring in LNR geoJSON data
-@st.cache_data
-def fetch_geojson():
+# On-disk cache for HTTP GET requests (postcodes.io and DataPoint site list), so responses survive restarts
+@st.cache_resource
+def install_http_cache():
+    '''
+    Patch requests to cache GET responses on disk for an hour (installed once per process)
+    '''
+    requests_cache.install_cache(
+        HTTP_CACHE_PATH,
+        expire_after=3600,
+        allowable_methods=('GET',),
+        # Keep the DataPoint API key out of cache keys and stored responses
+        ignored_parameters=['key'],
+        urls_expire_after={
+            # LNR data already has its own parquet snapshot
+            'services.arcgis.com': requests_cache.DO_NOT_CACHE,
+            # Forecast site list is cached, but forecasts themselves are only cached in memory
+            # (fetch_forecast_records), so they are never more than an hour old
+            'datapoint.metoffice.gov.uk/public/data/val/wxfcs/all/json/sitelist': 3600,
+            'datapoint.metoffice.gov.uk/public/data/val/wxfcs/all/json/*': requests_cache.DO_NOT_CACHE,
+        },
+    )
+
+# HTTP session, so postcode lookups reuse connections across reruns
+@st.cache_resource
+def get_http_session():
+    '''
+    Create requests session once and share it across reruns and sessions
+    Returns
+        requests.Session: HTTP session
+    '''
+    return requests.Session()
+
+def download_reserves():
+    '''
+    Download LNR data and precompute centroids/simplified geometries
+    Returns
+        geopandas.GeoDataFrame: LNR polygons with centroid columns
+    '''
     url = 'https://services.arcgis.com/JJzESW51TqeY9uat/arcgis/rest/services/Local_Nature_Reserves_England/FeatureServer/0/query?outFields=*&where=1%3D1&f=geojson'
-    r = requests.get(url)
+    r = get_http_session().get(url)
     gdf = gpd.GeoDataFrame.from_features(r.json()["features"], crs='EPSG:4326')
+    # Centroids never change, so compute them once here (cached with the data). These are
+    # calculated on the British National Grid, as centroids in lat/lon degrees are inaccurate
+    projected = gdf.geometry.to_crs(epsg=27700)
+    centroids = gpd.GeoSeries(shapely.centroid(projected.values), crs='EPSG:27700').to_crs(epsg=4326).values
+    # Stored as float32 to halve memory traffic, which still gives sub-metre precision for England
+    gdf['centroid_lat'] = shapely.get_y(centroids).astype(np.float32)
+    gdf['centroid_lon'] = shapely.get_x(centroids).astype(np.float32)
+    # Drop vertices that aren't visible at the map zoom levels (~50m tolerance) to shrink the rendered GeoJSON
+    gdf['geometry'] = gdf.geometry.simplify(0.0005, preserve_topology=True)
+    # Round coordinates to 5 decimal places (~1m), which keeps the serialised GeoJSON compact
+    gdf['geometry'] = shapely.transform(gdf.geometry.values, lambda coords: np.round(coords, 5))
     return gdf
 
+# Function to bring in LNR geoJSON data (a shared resource, as callers only read it, so cache hits
+# don't copy the GeoDataFrame or rebuild the STRtree)
+@st.cache_resource(ttl=LNR_CACHE_MAX_AGE)
+def fetch_geojson():
+    # Read local snapshot if it is recent, otherwise download and refresh it (avoids network on cold start)
+    if os.path.exists(LNR_CACHE_PATH) and time.time() - os.path.getmtime(LNR_CACHE_PATH) < LNR_CACHE_MAX_AGE:
+        gdf = gpd.read_parquet(LNR_CACHE_PATH)
+    else:
+        gdf = download_reserves()
+        os.makedirs(os.path.dirname(LNR_CACHE_PATH), exist_ok=True)
+        # Write then rename, so a partially written snapshot is never read
+        gdf.to_parquet(LNR_CACHE_PATH + '.tmp')
+        os.replace(LNR_CACHE_PATH + '.tmp', LNR_CACHE_PATH)
+    # Spatial index over centroids (positions match rows of gdf)
+    tree = shapely.STRtree(shapely.points(gdf['centroid_lon'].values, gdf['centroid_lat'].values))
+    return gdf, tree
+
+# Function to find reserves within travel distance (cache is bounded, and expires well within the LNR data refresh)
+@st.cache_data(ttl=3600, max_entries=50, show_spinner=False)
+def compute_nearby(lat, lon, distance_miles):
+    '''
+    Find reserves within distance of a point (cached, so unrelated widget changes don't recompute this)
+    Args
+        lat (float): Latitude of postcode
+        lon (float): Longitude of postcode
+        distance_miles (float): Maximum travel distance
+    Returns
+        geopandas.GeoDataFrame: Reserves within distance threshold (ordered by distance)
+    '''
+    gdf, tree = fetch_geojson()
+    # Only compute distances for reserves whose centroid falls in a box around the postcode
+    candidates = tree.query(search_box(lat, lon, distance_miles))
+    # Get distance from postcode to each candidate polygon
+    # (rounded in float64, so the table and map popups don't show float32 representation noise)
+    distance = np.round(distance_to_centroids(lat, lon, gdf['centroid_lat'].values[candidates],
+                                              gdf['centroid_lon'].values[candidates]).astype(np.float64), 2)
+    # Order reserves within distance threshold by distance, so only those rows are copied out of gdf
+    within = np.flatnonzero(distance <= distance_miles)
+    order = within[np.argsort(distance[within], kind='stable')]
+    nearby = gdf.iloc[candidates[order]][['LNR_NAME', 'centroid_lat', 'centroid_lon', 'geometry']]
+    nearby['distance'] = distance[order]
+    return nearby.reset_index(drop=True)
+
+# Function to serialise nearby reserves for the map (cache is bounded, as each entry holds a GeoJSON string)
+@st.cache_data(ttl=3600, max_entries=50, show_spinner=False)
+def gdf_to_json(lat, lon, distance_miles, selected_names, _gdf_subset):
+    '''
+    Convert nearby reserves to GeoJSON (cached, keyed on the inputs that determine the subset and its colours)
+    Args
+        lat (float): Latitude of postcode
+        lon (float): Longitude of postcode
+        distance_miles (float): Maximum travel distance
+        selected_names (tuple): Names of reserves selected in the table
+        _gdf_subset (geopandas.GeoDataFrame): Reserves within distance threshold (not hashed)
+    Returns
+        str: GeoJSON string
+    '''
+    # Only serialise the columns the map reads (popup/tooltip name and distance, and fill colour)
+    return _gdf_subset[['LNR_NAME', 'distance', '_color', 'geometry']].to_json()
+
+# Function to build the folium map (cache is bounded, as each entry holds a full HTML page)
+@st.cache_data(ttl=3600, max_entries=50, show_spinner=False)
+def build_map_html(lat, lon, postcode, distance_miles, map_type, parks_json):
+    '''
+    Build map of nearby reserves (cached, so reruns from unrelated widgets don't rebuild the map)
+    Args
+        lat (float): Latitude of postcode
+        lon (float): Longitude of postcode
+        postcode (str): Postcode (shown on marker)
+        distance_miles (float): Maximum travel distance
+        map_type (str): Basemap tiles
+        parks_json (str): GeoJSON of nearby reserves
+    Returns
+        str: Map HTML
+    '''
+    # Folium map
+    m = folium.Map(tiles=map_type, location=(lat, lon), zoom_start=9.5, prefer_canvas=True)
+    # Add marker
+    folium.Marker(location=(lat, lon), popup=f"{postcode}").add_to(m)
+    # Convert distance to meters
+    radius_meters = distance_miles * 1609.34
+    # Define circle around marker
+    circle_marker = folium.Circle(
+        location=(lat, lon),
+        radius=radius_meters,
+        color='grey',
+        fill=False,
+        dash_array='3',  # Set dash_array for a dotted line
+        popup=f"{distance_miles} radius",
+        z_index=0
+    )
+    # Define popup over polygons
+    popup = folium.GeoJsonPopup(
+        fields=["LNR_NAME", 'distance'],
+        aliases=["Name", 'Distance (in miles)'],
+        localize=True,
+        labels=True,
+        style="background-color: yellow;",
+    )
+    tooltip = folium.GeoJsonTooltip(
+        fields=["LNR_NAME"],
+        aliases=["Name"],
+        localize=True,
+        sticky=False,
+        labels=True,
+        style="""
+            background-color: #F0EFEF;
+            border: 2px solid black;
+            border-radius: 3px;
+            box-shadow: 3px;
+        """,
+
+    )
+    # Add polygons
+    folium.GeoJson(parks_json, name='geojson_layer', 
+        tooltip=tooltip,
+        popup=popup, style_function=reserve_style).add_to(m)
+
+    # Add circle
+    circle_marker.add_to(m)
+    # Add layer control
+    folium.LayerControl().add_to(m)
+
+    return m.get_root().render()
+
+# Function to convert postcode to lat/lon
+@st.cache_data(ttl=86400, show_spinner=False)
+def resolve_postcode(postcode):
+    '''
+    Look up postcode location (cached, as postcodes rarely move)
+    Args
+        postcode (str): Normalised UK postcode
+    Returns
+        tuple: Latitude and longitude of postcode
+    '''
+    loc = get_http_session().get(f'https://api.postcodes.io/postcodes/{postcode}', timeout=3).json()
+    return loc['result']['latitude'], loc['result']['longitude']
+
+# Met Office DataPoint connection
+@st.cache_resource
+def get_datapoint_conn():
+    '''
+    Create DataPoint connection once and share it across reruns and sessions
+    Returns
+        datapoint.Manager.Manager: DataPoint connection
+    '''
+    return datapoint.connection(api_key=st.secrets['API_KEY'])
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def nearest_site(lat, lon):
+    '''
+    Find nearest Met Office forecast site
+    Args
+        lat (float): Latitude (snapped to grid to coalesce nearby queries)
+        lon (float): Longitude (snapped to grid to coalesce nearby queries)
+    Returns
+        str: Forecast site id
+    '''
+    return get_datapoint_conn().get_nearest_forecast_site(lat, lon).id
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_forecast_records(site_id):
+    '''
+    Get five day forecast for a Met Office site
+    Args
+        site_id (str): Forecast site id
+    Returns
+        list: Date, weather text, temperature, chance of precipitation and wind speed at each timestep
+    '''
+    # Get a forecast for the site with 3 hourly timesteps
+    forecast = get_datapoint_conn().get_forecast_for_site(site_id, "daily")
+    return [(timestep.date, timestep.weather.text, timestep.temperature.value,
+             timestep.precipitation.value, timestep.wind_speed.value)
+            for day in forecast.days for timestep in day.timesteps]
+
+def find_forecast_site(location):
+    '''
+    Get nearest Met Office site to a reserve (runs in a worker thread)
+    Args
+        location (tuple): Centroid latitude and longitude of reserve
+    Returns
+        str: Forecast site id
+    '''
+    lat, lon = location
+    # Snap to a 0.05 degree grid so neighbouring reserves share a cached lookup
+    return nearest_site(round(float(lat) * 20) / 20, round(float(lon) * 20) / 20)
+
 # Initialise session state
 if 'button_clicked' not in st.session_state:
     st.session_state['button_clicked'] = False
@@ -92,7 +356,7 @@ with st.expander("**Application instructions**"):
     st.write('''
         **Step 1.** Input valid UK postcode (note, this application only shows nature reserves in England).\n
         **Step 2.** Specify maximum travelling distance (this will be "as the crow flies" distance) from postcode to a nature reserve (in miles).\n
-        **Step 3.** Select type of weather forecast to show for each reserve (this can be temperature, chance of precipitation or wind speed).\n
+        **Step 3.** Select type of weather forecast to show for each reserve (this can be temperature, chance of precipitation or wind speed, and can be changed at any time).\n
         **Step 4.** (Optional) Change the base map, this can be adjusted to make the nature reserves more visible.\n
         **Step 5.** Press the 'Confirm' button.\n
         Once these inputs have been specified and the 'Confirm' button clicked, you can visualise local reserves on the output map. In addition to an interactive map, the following breakdown is also supplied:\n
@@ -100,37 +364,41 @@ with st.expander("**Application instructions**"):
         * A five-day weather forecast on temperature, precipitation and wind speed.
     ''')
 
-# Bring in LNR data
-gdf = fetch_geojson()
-
-# User settings
-postcode_settings, distance_settings, weather_settings, map_settings, run_button = st.columns((2, 2, 2, 2, 1))
-# Position button below empty space
-run_button.write('')
-postcode = postcode_settings.text_input('Enter valid UK postcode', value="", 
-max_chars=None, 
-key=None, 
-type="default", 
-help=None)
-distance_miles = distance_settings.number_input('Enter maximum travel distance (* **in miles** *)', 
-min_value=0, 
-max_value=100, 
-value=15)
-map_type = map_settings.selectbox(label ='Change basemap (* **optional** *)', options = [
-    'OpenStreetMap',
-    'cartodbpositron',
-    'Cartodb dark_matter'
-], index=0)
-# User input type of weather
+# Persist HTTP responses on disk (before any requests are made)
+install_http_cache()
+
+# Bring in LNR data (loaded up front so the first search doesn't wait on it)
+fetch_geojson()
+
+# User settings (inside a form, so the search only reruns when 'Confirm' is pressed rather than on every keystroke)
+search_settings, weather_settings = st.columns((7, 2))
+with search_settings.form('search_settings', border=False):
+    postcode_settings, distance_settings, map_settings, run_button = st.columns((2, 2, 2, 1))
+    # Position button below empty space
+    run_button.write('')
+    postcode = postcode_settings.text_input('Enter valid UK postcode', value="", 
+    max_chars=None, 
+    key=None, 
+    type="default", 
+    help=None)
+    distance_miles = distance_settings.number_input('Enter maximum travel distance (* **in miles** *)', 
+    min_value=0, 
+    max_value=100, 
+    value=15)
+    map_type = map_settings.selectbox(label ='Change basemap (* **optional** *)', options = [
+        'OpenStreetMap',
+        'cartodbpositron',
+        'Cartodb dark_matter'
+    ], index=0)
+    submitted = run_button.form_submit_button('Confirm', use_container_width=True)
+# User input type of weather (outside the form, so changing it updates the forecast straight away)
 weather_type = weather_settings.selectbox(label = 'Select weather feature', options = ['Tempurature (°C)', 
 'Chance of precipitation (%)', 'Wind speed (mph)'], index=0)
 
 
 # setting lat/lon based on postcode 
 try:
-    loc = requests.get(f'https://api.postcodes.io/postcodes/{postcode}').json()
-    lat = loc['result']['latitude']
-    lon = loc['result']['longitude']
+    lat, lon = resolve_postcode(postcode.strip().upper())
     postcode_entered = True
 except:
     st.warning('Please enter valid postcode to use this application', icon="⚠️")
@@ -141,16 +409,14 @@ except:
 mapping, information = st.columns((3, 2))
 
 # Setting session_state for button
-if run_button.button('Confirm', use_container_width=True):
+if submitted:
     st.session_state.button_clicked = True
 
 # Only running code once postcode has been entered
 if postcode_entered and st.session_state.button_clicked:
 
-    # Get distance from postcode to each polygon
-    gdf['distance'] = gdf['geometry'].apply(distance_from_poly, args=(lat, lon))
-    # Check distance within specified distance
-    _nearby_parks = gdf[gdf['distance'] <= distance_miles]
+    # Reserves within distance threshold (all later steps work on this small frame)
+    _nearby_parks = compute_nearby(lat, lon, distance_miles)
 
     if len(_nearby_parks) == 0:
         st.error('No nature reserves found near postcode. Please increase travelling distance and ensure postcode resides in England.', icon="🚨")
@@ -165,63 +431,14 @@ if postcode_entered and st.session_state.button_clicked:
             with information:
                 # Dataframe
                 st.subheader("Local nature reserves", help='Downloadable table showing sites within distance threshold (ordered by locality). Check boxes in the "Show weather forecast" column if you wish visualise the weather forecast for the chosen sites below (by default, the weather for the closest reserve is selected). Note, you can check multiple sites to compare the forecast across different LNRs.')
-                selection = dataframe_with_selections(nearby_parks.sort_values(by = 'distance (miles)', 
-                ascending = True).reset_index(drop=True))
-
-            # Folium map
-            m = folium.Map(tiles=map_type, location=(lat, lon), zoom_start=9.5)
-            # Add marker
-            folium.Marker(location=(lat, lon), popup=f"{postcode}").add_to(m)
-            # Convert distance to meters
-            radius_miles = miles_to_meters(distance_miles)
-            # Define circle around marker
-            circle_marker = folium.Circle(
-            location=(lat, lon),
-            radius=radius_miles,
-            color='grey',
-            fill=False,
-            dash_array='3',  # Set dash_array for a dotted line
-            popup=f"{distance_miles} radius",
-            z_index=0
-            )
-            # Define popup over polygons
-            popup = folium.GeoJsonPopup(
-                fields=["LNR_NAME", 'distance'],
-                aliases=["Name", 'Distance (in miles)'],
-                localize=True,
-                labels=True,
-                style="background-color: yellow;",
-            )
-            tooltip = folium.GeoJsonTooltip(
-                fields=["LNR_NAME"],
-                aliases=["Name"],
-                localize=True,
-                sticky=False,
-                labels=True,
-                style="""
-                    background-color: #F0EFEF;
-                    border: 2px solid black;
-                    border-radius: 3px;
-                    box-shadow: 3px;
-                """,
-
-            )
-            condition = lambda feature: '#3776ab' if feature['properties']['LNR_NAME'] in selection['Name'].to_list() else 'indianred'
-
-            # Add polygons
-            folium.GeoJson(gdf.to_json(), name='geojson_layer', 
-                tooltip=tooltip,
-                popup=popup, style_function=lambda feature: {
-                    'fillColor': condition(feature),
-                    'fillOpacity': 0.9,
-                    'color': 'grey',
-                    'weight': 0.1
-                },).add_to(m)
-
-            # Add circle
-            circle_marker.add_to(m)
-            # Add layer control
-            folium.LayerControl().add_to(m)
+                selection = dataframe_with_selections(nearby_parks)
+
+            # Colour reserves selected in the table blue and all others red
+            selected_names = set(selection.Name.tolist())
+            _nearby_parks['_color'] = np.where(_nearby_parks['LNR_NAME'].isin(selected_names), '#3776ab', 'indianred')
+
+            parks_json = gdf_to_json(lat, lon, distance_miles, tuple(sorted(selected_names)), _nearby_parks)
+            map_html = build_map_html(lat, lon, postcode, distance_miles, map_type, parks_json)
 
             # Add map to app 
             with mapping:
@@ -236,51 +453,36 @@ if postcode_entered and st.session_state.button_clicked:
                         </style>
                         """, unsafe_allow_html=True)
                 st.subheader('Mapping nature reserves', help='If the nature reserves are difficult to spot, try changing the basemap in the above settings. The shaded areas represent nature reserves (blue for reserves with "Show weather forecast" rows checked in the right hand table and all other reserves are shaded red). If colours are difficult to differentiate, hovering over the shaded region will show the name of the site.', divider='green')
-                st.caption('The dashed circle represents the threshold travel distance (centered at the input postcode). Hover over a nature reserve (shaded regions on the map) to show the name of the reserve. The map is interactive, so feel free to change the zoom or use your mouse to click and drag inside the map to explore other nature reserves.')
+                st.caption('The dashed circle represents the threshold travel distance (centered at the input postcode). Hover over a nature reserve (shaded regions on the map) to show the name of the reserve. The map is interactive, so feel free to change the zoom or use your mouse to click and drag inside the map to explore the nature reserves within the threshold distance.')
                 # Display the map
-                folium_static(m, width=1000,height=650)
-
-            # Get lat/lon list of LNR's within distance threshold
-            locations = gdf[gdf.LNR_NAME.isin(selection.Name.to_list())]['geometry'].centroid.to_list()
-
-            # Get weather data for selected locations
-            conn = datapoint.connection(api_key=st.secrets['API_KEY'])
-            locs_forecast = []
-            for locs, name in zip(locations, selection.Name.to_list()):
-            # Get the nearest site for my latitude and longitude
-                site = conn.get_nearest_forecast_site(locs.y, locs.x)
-
-                # Get a forecast for my nearest site with 3 hourly timesteps
-                forecast = conn.get_forecast_for_site(site.id, "daily")
-                date_list = []
-                text_list = []
-                temp_list = []
-                prec_list = []
-                wind_list = []
-                for day in forecast.days:
-
-                    # Loop through time steps and print out info
-                    for timestep in day.timesteps:
-                        date_list.append(timestep.date)
-                        text_list.append(timestep.weather.text)
-                        temp_list.append(timestep.temperature.value)
-                        prec_list.append(timestep.precipitation.value)
-                        wind_list.append(timestep.wind_speed.value)
-                        
-                forecast_df=pd.DataFrame()
-                forecast_df['date']=date_list
-                forecast_df['text']=text_list
-                forecast_df['Tempurature (°C)']=temp_list
-                forecast_df['Chance of precipitation (%)']=prec_list
-                forecast_df['Wind speed (mph)']=wind_list
-                forecast_df['location'] = name
-
-                locs_forecast.append(forecast_df)
-
-            forecast_df = pd.concat(locs_forecast)
+                components.html(map_html, height=650)
+
+            # Skip weather forecast entirely when no reserves are selected
+            if selection.empty:
+                information.info('Select a reserve in the table above to see its weather forecast')
+                st.stop()
+
+            # Get lat/lon of selected LNR's from the cached centroids (selection keeps the index of
+            # _nearby_parks, so coordinates come from the same rows even if reserve names repeat)
+            selected_centroids = _nearby_parks.loc[selection.index, ['centroid_lat', 'centroid_lon']]
+            locations = list(selected_centroids.itertuples(index=False, name=None))
+
+            # Get weather data for selected locations (requests are made concurrently, with worker
+            # threads attached to this script run so the cached helpers can be called from them)
+            with ThreadPoolExecutor(max_workers=8, initializer=add_script_run_ctx,
+                                    initargs=(None, get_script_run_ctx())) as executor:
+                site_ids = list(executor.map(find_forecast_site, locations))
+                # Nearby reserves often share a forecast site, so only fetch each site once
+                unique_site_ids = list(dict.fromkeys(site_ids))
+                site_forecasts = dict(zip(unique_site_ids, executor.map(fetch_forecast_records, unique_site_ids)))
+
+            # Build a single dataframe holding every selected location's forecast
+            records = [(*record, name) for site_id, name in zip(site_ids, selection.Name) for record in site_forecasts[site_id]]
+            forecast_df = pd.DataFrame.from_records(records, columns=['date', 'text', 'Tempurature (°C)',
+                                                                      'Chance of precipitation (%)', 'Wind speed (mph)', 'location'])
 
             # Add plotly figure showing weather
-            fig = px.line(forecast_df, x ='date', y=weather_type, color='location')
+            fig = px.line(forecast_df, x ='date', y=weather_type, color='location', render_mode='webgl')
             fig.update_layout(template = 'seaborn', 
             title = f'Five day weather forecast: {weather_type}', 
             xaxis_title='',